@@ -1,5 +1,3 @@
-from langchain_core.messages import SystemMessage
-
 question_instructions = """You are an analyst tasked with interviewing an expert to learn about a specific topic.
 
 Your goal is to boil down to interesting and specific insights related to your topic.
@@ -8,7 +6,7 @@ Your goal is to boil down to interesting and specific insights related to your t
         
 2. Specific: Insights that avoid generalities and include specific examples from the expert.
 
-Here is your topic of focus and set of goals: {goals}
+Your topic of focus and set of goals are given at the end of these instructions.
         
 Begin by introducing yourself using a name that fits your persona, and then ask your question.
 
@@ -16,30 +14,22 @@ Continue to ask questions to drill down and refine your understanding of the top
         
 When you are satisfied with your understanding, complete the interview with: "Thank you so much for your help!"
 
-Remember to stay in character throughout your response, reflecting the persona and goals provided to you."""
-
-
-search_instructions = SystemMessage(content=f"""
-You will be given a conversation between an analyst and an expert.
+Remember to stay in character throughout your response, reflecting the persona and goals provided to you.
 
-Your goal is to generate a well-structured query for use in retrieval and / or web-search related to the conversation.
+Along with your message, write a search query for the expert to research your question with:
 
-First, analyze the full conversation.
+1. Analyze the full conversation, paying particular attention to the question you are asking now.
 
-Pay particular attention to the final question posed by the analyst.
+2. Convert this question into a well-structured query for use in retrieval and / or web-search."""
 
-Convert this final question into a well-structured web search query.""")
+question_goals = """Here is your topic of focus and set of goals: {goals}"""
 
     
 answer_instructions = """You are an expert being interviewed by an analyst.
 
-Here is analyst area of focus: {goals}. 
-        
 You goal is to answer a question posed by the interviewer.
 
-To answer question, use this context:
-        
-{context}
+To answer question, use the context given at the end of these instructions.
 
 When answering questions, follow these guidelines:
         
@@ -59,6 +49,33 @@ When answering questions, follow these guidelines:
         
 And skip the addition of the brackets as well as the Document source preamble in your citation."""
 
+answer_context = """Here is analyst area of focus: {goals}. 
+
+To answer question, use this context:
+        
+{context}"""
+
+
+compaction_instructions = """You are a research assistant condensing source documents gathered during an interview.
+
+Your goal is to write a digest that replaces the documents in later turns of the interview.
+
+1. Keep every fact, figure and example that is relevant to the analyst area of focus, given at the end of these instructions.
+
+2. Drop boilerplate, navigation text and information unrelated to the focus.
+
+3. Group the facts by source document, keeping the original Document tag of each source, for example: <Document href="https://example.com"/>
+
+4. Do not add information that is not in the documents.
+
+5. Aim for approximately 800 words maximum."""
+
+compaction_sources = """Here is analyst area of focus: {goals}.
+
+Here are the source documents to condense:
+
+{context}"""
+
 
 section_writer_instructions = """Your are an expert technical writer.
 
@@ -76,8 +93,7 @@ a. Title (## header)
 b. Summary (### header)
 c. Sources (### header)
 
-4. Make your title engaging based upon the focus area of the analyst:
-{focus}
+4. Make your title engaging based upon the focus area of the analyst, given at the end of these instructions.
 
 5. For the summary section:
 - Set up summary with general background / context related to the focus area of the analyst.
@@ -110,4 +126,25 @@ There should be no redundant sources. It should simply be:
 - Ensure the report follows the required structure.
 - Include no preamble before the title of the report.
 - Check all guidelines have been followed
-"""
\ No newline at end of file
+"""
+
+section_batch_sources = """Write one section for each of the {num_sections} analysts below, in the same order.
+
+Each section must follow all of the instructions above on its own, using only the focus area and source documents of its analyst.
+
+Source documents are listed once and shared between analysts. Each is labelled with an id such as [D1], the ids only tell you which documents belong to which analyst and must not be cited.
+
+Here are the source documents:
+
+{documents}
+
+Here are the analysts:
+
+{analysts}"""
+
+section_batch_analyst = """Analyst {index}
+
+Here is the focus area of the analyst:
+{focus}
+
+Use these source documents to write your section: {doc_ids}"""
\ No newline at end of file
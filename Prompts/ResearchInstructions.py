@@ -1,6 +1,4 @@
-report_writer_instructions = """You are a technical writer creating a report on this overall topic: 
-
-{topic}
+report_writer_instructions = """You are a technical writer creating a report on the overall topic given at the end of these instructions.
     
 You have a team of analysts. Each analyst has done two things: 
 
@@ -26,14 +24,18 @@ To format your report:
 8. List your sources in order and do not repeat.
 
 [1] Source 1
-[2] Source 2
+[2] Source 2"""
+
+report_writer_context = """Here is the overall topic: 
+
+{topic}
 
 Here are the memos from your analysts to build your report from: 
 
 {context}"""
 
 
-intro_conclusion_instructions = """You are a technical writer finishing a report on {topic}
+intro_conclusion_instructions = """You are a technical writer finishing a report on the topic given at the end of these instructions.
 
 You will be given all of the sections of the report.
 
@@ -51,6 +53,8 @@ For your introduction, create a compelling title and use the # header for the ti
 
 For your introduction, use ## Introduction as the section header. 
 
-For your conclusion, use ## Conclusion as the section header.
+For your conclusion, use ## Conclusion as the section header."""
+
+intro_conclusion_context = """Here is the topic of the report: {topic}
 
 Here are the sections to reflect on for writing: {formatted_str_sections}"""
\ No newline at end of file
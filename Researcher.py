@@ -1,23 +1,42 @@
 import operator
+import sys
+import hashlib
+import asyncio
+from functools import lru_cache
 from typing import List, Annotated
 from langgraph.graph import StateGraph, START, END
 from typing_extensions import TypedDict
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import add_messages
-from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage
+from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
 from langgraph.types import Send
+from pydantic import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
-from SubGraphs.AnalystsGraph import AnalystGraph, Analyst, create_analysts, human_feedback
+from langchain_core.globals import set_llm_cache
+from langchain_community.cache import SQLiteCache
+from SubGraphs.AnalystsGraph import Analyst, create_analysts, human_feedback
 from SubGraphs.InterviewGraph import InterviewAgent
-from Prompts.ResearchInstructions import report_writer_instructions, intro_conclusion_instructions
+from SubGraphs.Checkpointer import shared_memory, sqlite_memory
+from SubGraphs.SemanticCache import SemanticCache, canonical_key
+from Prompts.InterviewInstructions import section_writer_instructions, section_batch_sources, section_batch_analyst
+from Prompts.ResearchInstructions import report_writer_instructions, report_writer_context, intro_conclusion_instructions, intro_conclusion_context
 
-analystGraph = AnalystGraph()
-Team = analystGraph.build_graph()
-print('Analyst Creation Graph Active')
+# Memoize Gemini calls across runs, every model is built with temperature=0 so cached generations stay valid
+set_llm_cache(SQLiteCache(database_path=".llm_cache.db"))
 
-interviewGraph = InterviewAgent()
-interviewSetup = interviewGraph.build_graph()
-print('Interview Graph Active')
+@lru_cache(maxsize=1)
+def get_interview_graph():
+    """Compile the interview sub-graph once and reuse it for every research agent
+
+    Returns:
+        interviewGraph: Compiled graph for conducting interviews
+    """
+    # No checkpointer of its own, the interviews persist through whichever one the research graph runs with
+    interview_graph = InterviewAgent().build_graph(as_subgraph=True)
+    print('Interview Graph Active')
+    return interview_graph
+
+SECTION_BATCH_SIZE = 4  # Analysts whose sections are written together in one LLM call
 
 class ResearchGraphState(TypedDict, total=False):
     messages: Annotated[list[AnyMessage], add_messages]     # Conversation
@@ -25,12 +44,19 @@ class ResearchGraphState(TypedDict, total=False):
     max_analysts: int   # Number of analysts
     human_analyst_feedback: str     # Human Feedback
     analysts: List[Analyst] # Analyst asking questions
-    sections: Annotated[list, operator.add] # Send() API key
+    sections_pending: Annotated[list, operator.add] # Send() API key, analyst focus and docs awaiting a section
+    sections: Annotated[list, operator.add] # Sections written from the interviews
+    formatted_sections: str # All sections joined once for the report writers
     introduction: str   # Introduction of the final report
     content: str    # Content of the final report
     conclusion: str # Conclusion of the final report
     final_report: str # Compiled final report
 
+class SectionBatch(BaseModel):
+    sections: List[str] = Field(
+        description="One markdown section per analyst, in the same order the analysts were given"
+    )
+
 class InputResearchGraphState(TypedDict, total=False):
     topic: str  # The topic of research
     max_analysts: int   # Number of analysts
@@ -46,10 +72,7 @@ def initiate_all_interviews(state: ResearchGraphState):
     Returns:
         list[Send] | Literal['create_analysts']: The next node to go to
     """
-    try:
-        human_analyst_feedback = state['human_analyst_feedback']
-    except:
-        human_analyst_feedback = None    # Check if human feedback is present
+    human_analyst_feedback = state.get('human_analyst_feedback')    # Check if human feedback is present
         
     if human_analyst_feedback:
         # Return to create analysts
@@ -66,14 +89,109 @@ def initiate_all_interviews(state: ResearchGraphState):
                                             )
                                                         ]}) for analyst in state['analysts']]
     
+def prepare_context(state: ResearchGraphState):
+    """Join the written sections once so every report writer can share them
+
+    Args:
+        state (ResearchGraphState): Graph state for the research graph
+
+    Returns:
+        dict[str, str]: Concatenated sections
+    """
+    return {"formatted_sections": "\n\n".join(state['sections'])}
+    
 class ResearchAgent():
-    def __init__(self):
+    def __init__(self, interview_graph=None):
         super(ResearchAgent, self).__init__()
+        self.interview_graph = interview_graph if interview_graph is not None else get_interview_graph()
+        self._compiled_graphs = {}  # id(checkpointer) -> compiled graph
         self.gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-        self.report_instructions = report_writer_instructions
-        self.intro_conclusion_instructions = intro_conclusion_instructions
+        self.section_batch_analyst = section_batch_analyst
+        self._structured_sections = self.gemini.with_structured_output(SectionBatch)
+        
+        # Prompts are built once, static instructions lead each system message so the prompt prefix stays cacheable
+        self._section_chain = ChatPromptTemplate.from_messages([
+            ("system", [{"type": "text", "text": section_writer_instructions}, {"type": "text", "text": section_batch_sources}]),
+            ("human", "Write the sections for these analysts."),
+        ]) | self._structured_sections
+        self._report_chain = ChatPromptTemplate.from_messages([
+            ("system", [{"type": "text", "text": report_writer_instructions}, {"type": "text", "text": report_writer_context}]),
+            ("human", "Write a report based upon these memos."),
+        ]) | self.gemini
+        self._intro_conclusion_chain = ChatPromptTemplate.from_messages([
+            ("system", [{"type": "text", "text": intro_conclusion_instructions}, {"type": "text", "text": intro_conclusion_context}]),
+            ("human", "Write the report {part}"),
+        ]) | self.gemini
+        self._section_cache = SemanticCache(path=".section_cache.json")   # Sections for near-identical focus areas, keyed on their exact docs
+
+    async def write_section_batch(self, pending_sections: list):
+        """Write the sections for a batch of analysts in a single LLM call
+
+        Args:
+            pending_sections (list): Analyst focus and gathered docs for each section
+
+        Returns:
+            list[str]: One section per analyst
+        """
+        # Analysts on one topic retrieve many of the same docs, include each doc body once and refer to it by id
+        doc_ids = {}
+        for pending in pending_sections:
+            for doc in pending["docs"]:
+                doc_ids.setdefault(doc, f"D{len(doc_ids) + 1}")
+        
+        documents = "\n\n---\n\n".join([f"[{doc_id}]\n{doc}" for doc, doc_id in doc_ids.items()])
+        analysts = "\n\n---\n\n".join(
+            [
+                self.section_batch_analyst.format(index=index, focus=pending["focus"],
+                                                  doc_ids=", ".join([doc_ids[doc] for doc in pending["docs"]]))
+                for index, pending in enumerate(pending_sections, start=1)
+            ]
+        )
+        batch = await self._section_chain.ainvoke({"num_sections": len(pending_sections), "documents": documents, "analysts": analysts})
+        sections = batch.sections
+        
+        # Sections can't be matched up with analysts when the count is off, write each analyst's section on its own instead
+        if len(sections) != len(pending_sections):
+            if len(pending_sections) > 1:
+                written = await asyncio.gather(*[self.write_section_batch([pending]) for pending in pending_sections])
+                return [section for single in written for section in single]
+            # A lone analyst's output is all theirs, keep exactly one section for them but leave it out of the cache
+            section = "\n\n".join(sections)
+            if not section.strip():
+                raise RuntimeError(f"No section was written for the analyst focus: {pending_sections[0]['focus']}")
+            return [section]
+        
+        # Only cache sections with content, an empty one would be served to every later run on the same docs
+        await asyncio.gather(*[self._section_cache.aupdate(pending["focus"], key=canonical_key(pending["docs"]), value=section)
+                               for pending, section in zip(pending_sections, sections) if section.strip()])
+        return sections
+
+    async def batch_write_sections(self, state: ResearchGraphState):
+        """Paraphrase the insights from every interview into formal report sections
 
-    def write_report(self, state: ResearchGraphState):
+        Args:
+            state (ResearchGraphState): Graph state for the research graph
+
+        Returns:
+            dict[str, list[str]]: The report sections
+        """
+        # Interviews queued while conducting them
+        pending_sections = state['sections_pending']
+        
+        # Reuse sections written for a near-identical focus over the same docs
+        cached_sections = await asyncio.gather(*[self._section_cache.alookup(pending["focus"], key=canonical_key(pending["docs"]))
+                                                 for pending in pending_sections])
+        pending_sections = [pending for pending, section in zip(pending_sections, cached_sections) if section is None]
+        
+        # Write a few analysts per call, larger batches start costing more in decode than they save in round trips
+        batches = [pending_sections[i:i + SECTION_BATCH_SIZE] for i in range(0, len(pending_sections), SECTION_BATCH_SIZE)]
+        written = await asyncio.gather(*[self.write_section_batch(batch) for batch in batches])
+        
+        # Fill the misses back in place, the report keeps the analysts in their original order
+        written = iter([section for batch in written for section in batch])
+        return {"sections": [section if section is not None else next(written) for section in cached_sections]}
+
+    async def write_report(self, state: ResearchGraphState):
         """Write the body of the final report
 
         Args:
@@ -83,18 +201,14 @@ class ResearchAgent():
             dict[str, str]: final body
         """
         # Full set of sections
-        sections = state['sections']
+        formatted_str_sections = state['formatted_sections']
         topic = state['topic']
         
-        # Concat all sections together
-        formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-        
         # Summarize the sections into a final report
-        system_message = self.report_instructions.format(topic=topic, context=formatted_str_sections)    
-        report = self.gemini.invoke([SystemMessage(content=system_message)]+[HumanMessage(content=f"Write a report based upon these memos.")])
+        report = await self._report_chain.ainvoke({"topic": topic, "context": formatted_str_sections})
         return {"content": report.content}
     
-    def write_introduction(self, state: ResearchGraphState):
+    async def write_introduction(self, state: ResearchGraphState):
         """Write the introduction of the final report
 
         Args:
@@ -104,18 +218,14 @@ class ResearchAgent():
             dict[str, str]: final introduction of the report
         """
         # Full set of sections
-        sections = state['sections']
+        formatted_str_sections = state['formatted_sections']
         topic = state['topic']
         
-        # Concat all the sections together
-        formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-        
         # Summarize the sections into a introduction
-        instructions = self.intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)
-        intro = self.gemini.invoke([instructions]+[HumanMessage(content=f"Write the report introduction")])
+        intro = await self._intro_conclusion_chain.ainvoke({"topic": topic, "formatted_str_sections": formatted_str_sections, "part": "introduction"})
         return {"introduction": intro.content}
     
-    def write_conclusion(self, state: ResearchGraphState):
+    async def write_conclusion(self, state: ResearchGraphState):
         """Write the conclusion of the final report
 
         Args:
@@ -125,15 +235,11 @@ class ResearchAgent():
             dict[str, str]: final conclusion of the report
         """
         # Full set of sections
-        sections = state['sections']
+        formatted_str_sections = state['formatted_sections']
         topic = state['topic']
         
-        # Concat all the sections together
-        formatted_str_sections = "\n\n".join([f"{section}" for section in sections])
-        
         # Summarize the sections into a introduction
-        instructions = self.intro_conclusion_instructions.format(topic=topic, formatted_str_sections=formatted_str_sections)
-        conclusion = self.gemini.invoke([instructions]+[HumanMessage(content=f"Write the report conclusion")])
+        conclusion = await self._intro_conclusion_chain.ainvoke({"topic": topic, "formatted_str_sections": formatted_str_sections, "part": "conclusion"})
         return {"conclusion": conclusion.content}
     
     def finalize_report(self, state: ResearchGraphState):
@@ -145,37 +251,38 @@ class ResearchAgent():
         Returns:
             dict[str, str]: Final research report
         """
+        # Drop the report's own title and move its sources after the conclusion
+        content = state["content"].removeprefix('## Insights')
+        content, has_sources, sources = content.partition("\n## Sources\n")
+        
         # Save the full final report
-        content = state["content"]
-        if content.startswith('## Insights'):
-            content=content.strip('## Insights')
-        
-        if '## Sources' in content:
-            try:
-                content, sources = content.split("\n## Sources\n")
-            except:
-                sources = None
-        else:
-            sources = None
-            
-        final_report = state['introduction'] + "\n\n---\n\n" + content + "\n\n---\n\n" + state['conclusion']
-        if sources is not None:
-            final_report += "\n\n## Sources\n" + sources
-        
-        print(final_report)
-        return {"final_report": final_report, "messages": [final_report]}
+        final_report = f"{state['introduction']}\n\n---\n\n{content}\n\n---\n\n{state['conclusion']}"
+        if has_sources:
+            final_report += f"\n\n## Sources\n{sources}"
+        
+        # The report itself only lives in final_report, so continued sessions don't re-send it with every message
+        return {"final_report": final_report, "messages": [AIMessage(content="Final report ready (see final_report)")]}
     
-    def build_graph(self):
-        """Build the final research agent
+    def build_graph(self, checkpointer=shared_memory, memoize=True):
+        """Build the final research agent, compiled once per checkpointer
+        
+        Args:
+            checkpointer (BaseCheckpointSaver): Checkpointer to persist the research state with
+            memoize (bool): Keep the compiled graph for later calls, turn off for checkpointers that only live for one run
         
         Returns:
             researcher: Deep Research Agent
         """
+        if memoize and id(checkpointer) in self._compiled_graphs:
+            return self._compiled_graphs[id(checkpointer)]
+        
         # Add Nodes
         builder = StateGraph(input_schema=InputResearchGraphState, state_schema=ResearchGraphState)
         builder.add_node("create_analysts", create_analysts)
         builder.add_node("human_feedback", human_feedback)
-        builder.add_node("conduct_interview", interviewSetup)
+        builder.add_node("conduct_interview", self.interview_graph)
+        builder.add_node("batch_write_sections", self.batch_write_sections)
+        builder.add_node("prepare_context", prepare_context)
         builder.add_node("write_report", self.write_report)
         builder.add_node("write_introduction",self.write_introduction)
         builder.add_node("write_conclusion",self.write_conclusion)
@@ -185,20 +292,81 @@ class ResearchAgent():
         builder.add_edge(START, "create_analysts")
         builder.add_edge("create_analysts", "human_feedback")
         builder.add_conditional_edges("human_feedback", initiate_all_interviews, ["create_analysts", "conduct_interview"])
-        builder.add_edge("conduct_interview", "write_report")
-        builder.add_edge("conduct_interview", "write_introduction")
-        builder.add_edge("conduct_interview", "write_conclusion")
+        builder.add_edge("conduct_interview", "batch_write_sections")
+        builder.add_edge("batch_write_sections", "prepare_context")
+        builder.add_edge("prepare_context", "write_report")
+        builder.add_edge("prepare_context", "write_introduction")
+        builder.add_edge("prepare_context", "write_conclusion")
         builder.add_edge(["write_conclusion", "write_report", "write_introduction"], "finalize_report")
         builder.add_edge("finalize_report", END)
         
         # Compile
-        memory = MemorySaver()
-        researcher = builder.compile(interrupt_before=['human_feedback'], checkpointer=memory)
+        researcher = builder.compile(interrupt_before=['human_feedback'], checkpointer=checkpointer)
+        if memoize:
+            self._compiled_graphs[id(checkpointer)] = researcher
         return researcher
     
 DeepReasearchAgent = ResearchAgent()
 graph = DeepReasearchAgent.build_graph()
 
+def research_thread_id(topic: str, max_analysts: int) -> str:
+    """Stable checkpoint thread for a research request, identical across processes
+
+    Args:
+        topic (str): The topic of research
+        max_analysts (int): Number of analysts
+
+    Returns:
+        str: Thread id
+    """
+    return hashlib.sha256(f"{topic}\n{max_analysts}".encode()).hexdigest()
+
+async def run_research(topic: str, max_analysts: int, thread_id: str = None):
+    """Run the whole research flow on the current event loop
+
+    Interviews, their searches and the report writers all overlap as coroutines, so callers
+    must await this from a running loop, or use asyncio.run(run_research(...)) at top level.
+    Checkpoints are kept on disk, so repeating a request returns its finished report and an
+    interrupted run picks up from its last completed step.
+
+    Args:
+        topic (str): The topic of research
+        max_analysts (int): Number of analysts
+        thread_id (str, optional): Checkpoint thread to run on, derived from the request by default
+
+    Returns:
+        str: Compiled final report
+    """
+    config = {"configurable": {"thread_id": thread_id or research_thread_id(topic, max_analysts)}}
+    
+    async with sqlite_memory() as memory:
+        # The saver is closed when the run ends, so its graph is not worth keeping around
+        researcher = DeepReasearchAgent.build_graph(checkpointer=memory, memoize=False)
+        snapshot = await researcher.aget_state(config)
+        
+        # Finished before, serve the report straight from the checkpoint
+        if snapshot.values.get("final_report") and not snapshot.next:
+            return snapshot.values["final_report"]
+        
+        # Nothing pending on this thread, run until the human feedback interrupt once the analysts are created
+        if not snapshot.next:
+            await researcher.ainvoke({"topic": topic, "max_analysts": max_analysts}, config)
+        
+        # Resume without feedback until the graph ends, a run that failed before the human feedback pause stops there again first
+        snapshot = await researcher.aget_state(config)
+        while snapshot.next:
+            await researcher.ainvoke(None, config)
+            snapshot = await researcher.aget_state(config)
+        
+        if not snapshot.values.get("final_report"):
+            raise RuntimeError(f"Research run on thread {config['configurable']['thread_id']} ended without a final report")
+        return snapshot.values["final_report"]
+
 if __name__ == "__main__":
-    print("Graph compiled successfully!")
-    print(f"Graph nodes: {graph.nodes}")
\ No newline at end of file
+    # Usage: python Researcher.py "<topic>" [max_analysts]
+    if len(sys.argv) < 2:
+        print("Graph compiled successfully!")
+        print(f"Graph nodes: {graph.nodes}")
+    else:
+        # Printed here rather than in finalize_report, so a report served from its checkpoint shows up too
+        print(asyncio.run(run_research(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)))
\ No newline at end of file
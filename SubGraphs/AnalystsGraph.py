@@ -7,7 +7,8 @@ from langgraph.graph import add_messages
 from typing import Annotated
 from langgraph.graph import START, END, StateGraph
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import HumanMessage, SystemMessage
+from SubGraphs.SemanticCache import SemanticCache
+from langchain_core.prompts import ChatPromptTemplate
 from Prompts.AnalystInstructions import analyst_instructions
 import sys
 import asyncio
@@ -39,6 +40,15 @@ class AnalystTeam(BaseModel):
         description="Comprehensive list of analysts with their roles and affiliations"
     )
     
+# Built once, with_structured_output compiles the pydantic schema into a tool spec on every call
+gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
+structured_llm = gemini.with_structured_output(AnalystTeam)
+analyst_chain = ChatPromptTemplate.from_messages([
+    ("system", analyst_instructions),
+    ("human", "Generate the set of analysts"),
+]) | structured_llm
+analyst_cache = SemanticCache(path=".analyst_cache.json")     # Teams for near-identical topics, keyed on max_analysts
+    
 class GenerateAnalystsState(TypedDict, total=False):
     """State for analyst generation"""
     messages: Annotated[list[AnyMessage], add_messages]     # User and bot conversation
@@ -61,20 +71,19 @@ def create_analysts(state: GenerateAnalystsState) -> dict[str, any]:
     # print('hi-------')
     # print(state)
     max_analysts = state['max_analysts']
-    try:
-        human_analyst_feedback = state['human_analyst_feedback']
-        state['human_analyst_feedback'] = None
-    except:
-        human_analyst_feedback = None
+    human_analyst_feedback = state.get('human_analyst_feedback')
     
-    gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-    structured_llm = gemini.with_structured_output(AnalystTeam)
+    # Reuse a team generated for a near-identical topic, feedback always asks for a fresh team
+    if not human_analyst_feedback:
+        cached_analysts = analyst_cache.lookup(topic, key=str(max_analysts))
+        if cached_analysts is not None:
+            return {"analysts": [Analyst(**analyst) for analyst in cached_analysts], "messages": [topic]}
     
-    system_message = analyst_instructions.format(topic=topic,
-                                                human_analyst_feedback=human_analyst_feedback,
-                                                max_analysts=max_analysts)
-
-    analysts = structured_llm.invoke([SystemMessage(content=system_message)] + [HumanMessage(content="Generate the set of analysts")])
+    analysts = analyst_chain.invoke({"topic": topic,
+                                     "human_analyst_feedback": human_analyst_feedback,
+                                     "max_analysts": max_analysts})
+    if not human_analyst_feedback:
+        analyst_cache.update(topic, key=str(max_analysts), value=[analyst.model_dump() for analyst in analysts.analysts])
     
     return {"analysts": analysts.analysts, "messages": [topic]}
 
@@ -91,7 +100,10 @@ class AnalystGraph:
         super(AnalystGraph, self).__init__()
         self.gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
         self.instructions = analyst_instructions
+        self.memory = MemorySaver()  # Own saver when run standalone, so thread ids never collide with other graphs
+        self._compiled_graphs = {}  # id(checkpointer) -> compiled graph
     
+    @staticmethod
     def should_continue(state: GenerateAnalystsState) -> Literal["create_analysts", END]:       #type: ignore
         """Return the next node to route to
 
@@ -101,10 +113,7 @@ class AnalystGraph:
         Returns:
             Literal["create_analysts", END]: Next node to execute
         """
-        try:
-            human_feedback = state['human_analyst_feedback']
-        except:
-            human_feedback = None
+        human_feedback = state.get('human_analyst_feedback')
         
         if human_feedback and human_feedback != 'continue':
             state['messages'].append(human_feedback)
@@ -112,15 +121,19 @@ class AnalystGraph:
 
         return END
     
-    def build_graph(self):
-        """Build the Analyst creation graph
+    def build_graph(self, checkpointer=None):
+        """Build the Analyst creation graph, compiled once per checkpointer
 
         Args:
-            state (GenerateAnalystsState): Subgraph state for analyst creation
+            checkpointer (BaseCheckpointSaver, optional): Checkpointer to persist the graph state with, this agent's own MemorySaver by default
         
         Returns:
             graph: The analyst creation graph
         """
+        checkpointer = checkpointer or self.memory
+        if id(checkpointer) in self._compiled_graphs:
+            return self._compiled_graphs[id(checkpointer)]
+        
         builder = StateGraph(GenerateAnalystsState)
         builder.add_node("create_analysts", create_analysts)
         builder.add_node("human_feedback", human_feedback)
@@ -129,7 +142,7 @@ class AnalystGraph:
         builder.add_edge("create_analysts", "human_feedback")
         builder.add_conditional_edges("human_feedback", self.should_continue, ["create_analysts", END])
         
-        memory = MemorySaver()
-        graph = builder.compile(interrupt_before=["human_feedback"], checkpointer=memory)
+        graph = builder.compile(interrupt_before=["human_feedback"], checkpointer=checkpointer)
+        self._compiled_graphs[id(checkpointer)] = graph
         
         return graph
\ No newline at end of file
@@ -0,0 +1,22 @@
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+SQLITE_CHECKPOINTS = ".langgraph.db"    # On-disk checkpoints for research runs
+
+# Checkpointer of the research graph, its interview subgraphs inherit it and are kept apart by their namespace.
+# Standalone analyst and interview graphs use their own MemorySaver, so thread ids never collide across graphs
+shared_memory = MemorySaver()
+
+def sqlite_memory(path: str = SQLITE_CHECKPOINTS):
+    """Checkpointer persisted to disk so finished or interrupted runs survive a restart
+
+    AsyncSqliteSaver binds to the running event loop, so enter it from inside one:
+    async with sqlite_memory() as memory: ...
+
+    Args:
+        path (str): SQLite database file
+
+    Returns:
+        AsyncContextManager[AsyncSqliteSaver]: Checkpointer backed by the database
+    """
+    return AsyncSqliteSaver.from_conn_string(path)
@@ -3,9 +3,12 @@ from typing import Annotated, List, Literal
 from langgraph.graph import MessagesState, StateGraph, START, END
 from SubGraphs.AnalystsGraph import Analyst
 from pydantic import BaseModel, Field
-from Prompts.InterviewInstructions import question_instructions, search_instructions, answer_instructions, section_writer_instructions
-from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
+from Prompts.InterviewInstructions import question_instructions, question_goals, answer_instructions, answer_context, compaction_instructions, compaction_sources
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import sys
+import time
+from collections import OrderedDict
 import asyncio
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.document_loaders import WikipediaLoader
@@ -16,39 +19,100 @@ from langgraph.checkpoint.memory import MemorySaver
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+SEARCH_CACHE_TTL = 3600  # Seconds a retrieved set of docs is reused for an identical query
+SEARCH_CACHE_SIZE = 256 # Most recently used (source, query) retrievals kept in the cache
+CONTEXT_COMPACT_THRESHOLD = 24000   # Characters of answer context after which it is summarized into a digest
+MESSAGE_WINDOW = 8  # Most recent interview messages the question and answer prompts see, besides the opening one
+
 class InterviewState(MessagesState):
     max_num_turns: int  # Max number of interview turns
-    context: Annotated[List, operator.add]  # Source docs
+    expert_answers: int # Number of answers the expert has given
+    search_query: str   # Search query for the latest question
+    context: Annotated[List, operator.add]  # Source docs, one formatted doc per entry
+    digest: str # Summary standing in for the oldest docs in the answer prompt
+    digested_docs: int  # Number of distinct docs the digest covers
     analyst: Analyst    # The analyst asking questions
     interview: str  # Interview transcript
-    sections: list  # Final key we duplicate in outer state for Send() API
+    sections_pending: list  # Final key we duplicate in outer state for Send() API
     
-class SearchQuery(BaseModel):
-    search_query: str = Field(None , description="Search query for the retrieval")
+class QuestionAndQuery(BaseModel):
+    question: str = Field(
+        description="Your message to the expert, staying in character"
+    )
+    search_query: str = Field(
+        description="Search query for the retrieval of information that answers the question"
+    )
 
-def route_messages(state: InterviewState, name: str = "expert") -> Literal['save_interview', 'ask_question']:
-    """Routes between interview and section writing
+def unique_docs(context: list) -> list[str]:
+    """Drop empty and repeated docs, keeping the order they were gathered in
+
+    Args:
+        context (list): Source docs accumulated over the interview
+
+    Returns:
+        list[str]: Each distinct formatted doc once
+    """
+    return list(dict.fromkeys(doc for doc in context if doc))
+
+def format_context(context: list) -> str:
+    """Render the gathered docs as one canonical string
+
+    Docs stay in the order they were gathered so each turn only appends to the
+    previous turn's context, keeping the prompt prefix identical for provider caching.
+
+    Args:
+        context (list): Source docs accumulated over the interview
+
+    Returns:
+        str: Formatted source docs without empty or repeated entries
+    """
+    return "\n\n---\n\n".join(unique_docs(context))
+
+def answer_docs(state: InterviewState) -> list[str]:
+    """Docs the expert answers from, the digest followed by the docs gathered since it was written
+
+    Args:
+        state (InterviewState): subgraph state for the interview
+
+    Returns:
+        list[str]: Digest and formatted source docs
+    """
+    docs = unique_docs(state['context'])
+    digest = state.get('digest')
+    return ([digest] if digest else []) + docs[state.get('digested_docs', 0):]
+
+def recent_messages(state: InterviewState) -> list:
+    """Conversation the question and answer prompts see, the opening message and the latest turns
+
+    The full conversation stays in state for the transcript, only the prompts are capped so long
+    interviews don't grow their prefill with every turn.
 
     Args:
         state (InterviewState): subgraph state for the interview
 
     Returns:
-        dict[str, str]: interview transcript
+        list: Messages for the prompt
+    """
+    messages = state['messages']
+    if len(messages) <= MESSAGE_WINDOW + 1:
+        return messages
+    return messages[:1] + messages[-MESSAGE_WINDOW:]
+
+def route_messages(state: InterviewState) -> Literal['save_interview', 'ask_question'] | list[str]:
+    """Routes between asking another question and saving the interview
+
+    Args:
+        state (InterviewState): subgraph state for the interview
+
+    Returns:
+        Literal['save_interview', 'ask_question'] | list[str]: Next node(s) to execute
     """
     # Get messages
     messages = state['messages']
-    try:
-        max_num_turns = state['max_num_turns']
-    except:
-        max_num_turns = 3
-    
-    # Check the number of expert answers
-    num_responses = len(
-        [m for m in messages if isinstance(m, AIMessage) and m.name == name]
-    )
+    max_num_turns = state.get('max_num_turns', 3)
     
     # End if expert has answered more than the max turns
-    if num_responses >= max_num_turns:
+    if state.get('expert_answers', 0) >= max_num_turns:
         return 'save_interview'
     
     # This router is run after each question-answer pair
@@ -57,6 +121,10 @@ def route_messages(state: InterviewState, name: str = "expert") -> Literal['save
     
     if "Thank you so much for your help" in last_question.content:
         return 'save_interview'
+    
+    # Summarize an oversized context while the next question is being generated
+    if sum(len(doc) for doc in answer_docs(state)) > CONTEXT_COMPACT_THRESHOLD:
+        return ['ask_question', 'compact_context']
     return 'ask_question'
     
 class InterviewAgent():
@@ -64,93 +132,162 @@ class InterviewAgent():
         super(InterviewAgent, self).__init__()
         
         self.gemini = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-        self.question_instructions = question_instructions
-        self.search_instructions = search_instructions
-        self.answer_instructions = answer_instructions
-        self.section_writer_instructions = section_writer_instructions
+        self._structured_question = self.gemini.with_structured_output(QuestionAndQuery)
+        
+        # Prompts are built once, static instructions lead each system message so the prompt prefix stays cacheable
+        self._question_chain = ChatPromptTemplate.from_messages([
+            ("system", [{"type": "text", "text": question_instructions}, {"type": "text", "text": question_goals}]),
+            MessagesPlaceholder("messages"),
+        ]) | self._structured_question
+        self._answer_chain = ChatPromptTemplate.from_messages([
+            ("system", [{"type": "text", "text": answer_instructions}, {"type": "text", "text": answer_context}]),
+            MessagesPlaceholder("messages"),
+        ]) | self.gemini
+        self._compaction_chain = ChatPromptTemplate.from_messages([
+            ("system", [{"type": "text", "text": compaction_instructions}, {"type": "text", "text": compaction_sources}]),
+            ("human", "Write the digest of these source documents."),
+        ]) | self.gemini
+        self._tavily = TavilySearchResults(max_results=3)
+        self._search_cache = OrderedDict()  # (source, query) -> (started_at, retrieval task), least recently used first
+        self.memory = MemorySaver()  # Own saver when run standalone, so thread ids never collide with other graphs
+        self._compiled_graphs = {}  # id(checkpointer) -> compiled graph
+    
+    async def _cached_search(self, source: str, query: str, fetch):
+        """Run a retrieval once per (source, query), sharing it with concurrent and later identical searches
+
+        Args:
+            source (str): Retriever the docs come from
+            query (str): search query for the retrieval
+            fetch (Callable[[str], Awaitable[list[str]]]): Retrieval to run on a miss
+
+        Returns:
+            list[str]: Formatted source docs, empty if the retrieval failed
+        """
+        key = (source, query)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            started_at, task = cached
+            # Evict expired entries, and in-flight ones left behind by an event loop that has since closed
+            if time.monotonic() - started_at > SEARCH_CACHE_TTL or (not task.done() and task.get_loop() is not asyncio.get_running_loop()):
+                del self._search_cache[key]
+                cached = None
+            else:
+                self._search_cache.move_to_end(key)
+        
+        # Store the task rather than its result so analysts asking the same thing at once share one request
+        if cached is None:
+            task = asyncio.ensure_future(fetch(query))
+            self._search_cache[key] = (time.monotonic(), task)
+            if len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
         
-    def generate_question(self, state: InterviewState):
-        """Node for an analyst to generate a question
+        try:
+            # Shielded so one cancelled interview doesn't cancel the search for the others awaiting it
+            return await asyncio.shield(task)
+        except Exception as e:
+            # Failed retrievals are not cached
+            if self._search_cache.get(key, (None, None))[1] is task:
+                del self._search_cache[key]
+            return []
+        
+    async def generate_question(self, state: InterviewState):
+        """Node for an analyst to generate a question along with the search query to research it
 
         Args:
             state (InterviewState): Subgraph state for the interview
 
         Returns:
-            dict[str, list[AIMessage]]: Interview transcript
+            dict[str, any]: Interview transcript and search query
         """
         # Get state
         analyst = state['analyst']
-        messages = state['messages']
+        messages = recent_messages(state)
         
-        # Generate question
-        system_message = self.question_instructions.format(goals=analyst.persona)
-        question = self.gemini.invoke([SystemMessage(content=system_message)] + messages)
+        # Generate question and search query in a single call
+        question = await self._question_chain.ainvoke({"goals": analyst.persona, "messages": messages})
         
         # Write messages to state
-        return {"messages": [question]}
+        return {"messages": [AIMessage(content=question.question)], "search_query": question.search_query}
     
-    def search_web(self, state: InterviewState):
+    async def search_web(self, query: str):
         """Retrieve documents from the web
 
         Args:
-            state (InterviewState): subgraph state for the interview
+            query (str): search query for the retrieval
 
         Returns:
-            dict[str, list[str]]: List of source docs
+            list[str]: Formatted source docs
         """
-        # Search query
-        structured_gemini = self.gemini.with_structured_output(SearchQuery)
-        search_query = structured_gemini.invoke([self.search_instructions]+state['messages'])
+        return await self._cached_search("web", query, self._fetch_web)
+    
+    async def _fetch_web(self, query: str):
+        """Search the web with Tavily
+
+        Args:
+            query (str): search query for the retrieval
+
+        Returns:
+            list[str]: Formatted source docs
+        """
+        # Search
+        search_docs = await self._tavily.ainvoke(query)
         
-        try:
-            # Search
-            tavilly_search = TavilySearchResults(max_results=3)
-            search_docs = tavilly_search.invoke(search_query.search_query)
-            
-            # Format
-            formatted_search_docs = "\n\n---\n\n".join(
-                [
-                    f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
-                    for doc in search_docs
-                ]
-            )
-            
-            return {"context": [formatted_search_docs]}
-        except Exception as e:
-            return {"context": [""]}
+        # Format
+        return [
+            f'<Document href="{doc["url"]}"/>\n{doc["content"]}\n</Document>'
+            for doc in search_docs
+        ]
     
-    def search_wikipedia(self, state: InterviewState):
+    async def search_wikipedia(self, query: str):
         """Retrieve documents from wikipedia
 
+        Args:
+            query (str): search query for the retrieval
+
+        Returns:
+            list[str]: Formatted source docs
+        """
+        return await self._cached_search("wikipedia", query, self._fetch_wikipedia)
+    
+    async def _fetch_wikipedia(self, query: str):
+        """Load matching wikipedia pages
+
+        Args:
+            query (str): search query for the retrieval
+
+        Returns:
+            list[str]: Formatted source docs
+        """
+        # Search
+        # WikipediaLoader is sync-only, keep it off the event loop
+        search_docs = await asyncio.to_thread(WikipediaLoader(query=query, load_max_docs=2).load)
+            
+        # Format
+        return [
+            f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
+            for doc in search_docs
+        ]
+    
+    async def gather_sources(self, state: InterviewState):
+        """Retrieve documents from the web and wikipedia concurrently
+
         Args:
             state (InterviewState): subgraph state for the interview
 
         Returns:
             dict[str, list[str]]: List of source docs
         """
+        # Search query, written alongside the question and shared by both retrievers
+        search_query = state['search_query']
         
-        # Search query
-        structured_gemini = self.gemini.with_structured_output(SearchQuery)
-        search_query = structured_gemini.invoke([search_instructions] + state['messages'])
+        # Search
+        web_docs, wikipedia_docs = await asyncio.gather(self.search_web(search_query),
+                                                        self.search_wikipedia(search_query))
         
-        try:
-            # Search
-            search_docs = WikipediaLoader(query=search_query.search_query,
-                                          load_max_docs=2).load()
-                
-            # Format
-            formatted_search_docs = "\n\n---\n\n".join(
-                [
-                    f'<Document source="{doc.metadata["source"]}" page="{doc.metadata.get("page", "")}"/>\n{doc.page_content}\n</Document>'
-                    for doc in search_docs
-                ]
-            )
-
-            return {"context": [formatted_search_docs]}  
-        except Exception as e:
-            return {"context": [""]}
+        # Keep docs separate so repeats across turns can be dropped individually
+        return {"context": web_docs + wikipedia_docs}
         
-    def generate_answer(self, state: InterviewState):
+    async def generate_answer(self, state: InterviewState):
         """Node for an expert to answer an analyst's question
 
         Args:
@@ -161,83 +298,91 @@ class InterviewAgent():
         """
         # Get state
         analyst = state['analyst']
-        messages = state['messages']
-        context = state['context']
+        messages = recent_messages(state)
+        context = format_context(answer_docs(state))
         
-        # Answer question
-        system_message = self.answer_instructions.format(goals=analyst.persona, context=context)
-        answer = self.gemini.invoke([SystemMessage(content=system_message)] + messages)
+        # Answer question, dynamic conversation goes last after the instructions and context
+        answer = await self._answer_chain.ainvoke({"goals": analyst.persona, "context": context, "messages": messages})
         
         # Name the message as coming from the expert
         answer.name = "expert"
         
-        # Append it to the state
-        return {"messages": [answer]}
+        # Append it to the state and count the answer for routing
+        return {"messages": [answer], "expert_answers": state.get('expert_answers', 0) + 1}
     
-    def save_interview(self, state: InterviewState):
-        """Saves the interview transcript as a string
+    async def compact_context(self, state: InterviewState):
+        """Summarize the answer context into a digest so later prompts stay bounded
+
+        Only the expert's view is compacted, the gathered docs are kept whole for section writing.
 
         Args:
             state (InterviewState): subgraph state for the interview
 
         Returns:
-            dict[str, str]: interview transcript
+            dict[str, any]: Digest and the number of distinct docs it covers
         """
-        # Get messages
-        messages = state['messages']
+        # Get state
+        analyst = state['analyst']
+        context = format_context(answer_docs(state))
         
-        # Convert interview to a string
-        interview = get_buffer_string(messages=messages)
+        # Summarize the previous digest and newer docs, keeping the source references the expert cites
+        digest = await self._compaction_chain.ainvoke({"goals": analyst.persona, "context": context})
         
-        # Save to interviews key
-        return {"interview": interview}
+        # Docs gathered from here on are appended after the digest
+        return {"digest": digest.content, "digested_docs": len(unique_docs(state['context']))}
     
-    def write_section(self, state: InterviewState):
-        """Node to paraphrase the insights derived from the interview into a formal document
+    def save_interview(self, state: InterviewState):
+        """Saves the interview transcript as a string and queues its section for writing
 
         Args:
-            state (InterviewState): subgraph state for the Interview
+            state (InterviewState): subgraph state for the interview
 
         Returns:
-            dict[str, list[str]]: The report content
+            dict[str, any]: interview transcript and the analyst focus with its distinct gathered docs
         """
-        # Get state
-        context = state['context']
-        analyst = state['analyst']
+        # Get messages
+        messages = state['messages']
+        
+        # Convert interview to a string
+        interview = get_buffer_string(messages=messages)
         
-        # Write the section using either the gathered docs from the interview (context) or the interview itself (interview)
-        system_message = self.section_writer_instructions.format(focus=analyst.description)
-        section = self.gemini.invoke([SystemMessage(content=system_message)] + [HumanMessage(content=f"Use this source to write your section: {context}")])
+        # Sections are written in batches across all analysts once every interview is done
+        pending_section = {"focus": state['analyst'].description, "docs": unique_docs(state['context'])}
         
-        # Append it to the state
-        return {'sections': [section.content]}
+        # Save to interviews key
+        return {"interview": interview, "sections_pending": [pending_section]}
     
-    def build_graph(self):
-        """Building the Interview sub-graph
+    def build_graph(self, checkpointer=None, as_subgraph=False):
+        """Building the Interview sub-graph, compiled once per checkpointer
+
+        Args:
+            checkpointer (BaseCheckpointSaver, optional): Checkpointer to persist the interview state with, this agent's own MemorySaver by default
+            as_subgraph (bool): Compile without a checkpointer so the interviews persist through the parent graph's one
 
         Returns:
             interviewGraph: Compiled graph for conducting interviews
         """
+        checkpointer = None if as_subgraph else checkpointer or self.memory
+        if id(checkpointer) in self._compiled_graphs:
+            return self._compiled_graphs[id(checkpointer)]
+        
         # Creating nodes
         interview_builder = StateGraph(InterviewState)
         interview_builder.add_node("ask_question", self.generate_question)
-        interview_builder.add_node("search_web", self.search_web)
-        interview_builder.add_node("search_wikipedia", self.search_wikipedia)
+        interview_builder.add_node("gather_sources", self.gather_sources)
         interview_builder.add_node("answer_question", self.generate_answer)
+        interview_builder.add_node("compact_context", self.compact_context)
         interview_builder.add_node("save_interview", self.save_interview)
-        interview_builder.add_node("write_section", self.write_section)
         
         # Create edges and flow
         interview_builder.add_edge(START, "ask_question")
-        interview_builder.add_edge("ask_question", "search_web")
-        interview_builder.add_edge("ask_question", "search_wikipedia")
-        interview_builder.add_edge("search_web", "answer_question")
-        interview_builder.add_edge("search_wikipedia", "answer_question")
-        interview_builder.add_conditional_edges("answer_question", route_messages, ['ask_question', 'save_interview'])
-        interview_builder.add_edge("save_interview", "write_section")
-        interview_builder.add_edge("write_section", END)
-        
-        memory = MemorySaver()
-        interviewGraph = interview_builder.compile(checkpointer=memory).with_config(run_name="Conduct Interviews")
+        interview_builder.add_edge("ask_question", "gather_sources")
+        interview_builder.add_edge("gather_sources", "answer_question")
+        interview_builder.add_conditional_edges("answer_question", route_messages, ['ask_question', 'compact_context', 'save_interview'])
+        interview_builder.add_edge("compact_context", "gather_sources")
+        interview_builder.add_edge("save_interview", END)
+        
+        interviewGraph = interview_builder.compile(checkpointer=checkpointer).with_config(run_name="Conduct Interviews")
+        self._compiled_graphs[id(checkpointer)] = interviewGraph
         
         return interviewGraph
\ No newline at end of file
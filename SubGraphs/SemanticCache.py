@@ -0,0 +1,94 @@
+import os
+import hashlib
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+SEMANTIC_CACHE_THRESHOLD = 0.95 # Minimum cosine similarity for a cached result to be reused
+
+embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+
+def canonical_key(items: list) -> str:
+    """Hash a collection of strings independently of its order
+
+    Args:
+        items (list): Strings identifying the exact inputs, e.g. formatted source docs
+
+    Returns:
+        str: Stable hex digest
+    """
+    return hashlib.sha256("\n".join(sorted(items)).encode()).hexdigest()
+
+class SemanticCache:
+    """Reuses results for semantically equivalent text that shares the same exact key"""
+    def __init__(self, path: str = None, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        """
+        Args:
+            path (str, optional): JSON file the entries persist to, so runs in a new process reuse them. In memory only when None
+            threshold (float): Minimum cosine similarity for a hit
+        """
+        super(SemanticCache, self).__init__()
+        self.path = path
+        # Entries keep their embeddings on disk, a restart pays nothing to warm the cache back up
+        if path and os.path.exists(path):
+            self.store = InMemoryVectorStore.load(path, embeddings)
+        else:
+            self.store = InMemoryVectorStore(embeddings)
+        self.threshold = threshold
+    
+    def _persist(self):
+        """Write every entry to the cache file, values must be JSON serializable"""
+        if self.path:
+            self.store.dump(self.path)
+    
+    def _best_match(self, results):
+        """Return the cached value of the closest hit if it is similar enough
+
+        Args:
+            results (list[tuple[Document, float]]): Closest cached entry and its cosine similarity
+
+        Returns:
+            any | None: Cached value, None on a miss
+        """
+        if results and results[0][1] >= self.threshold:
+            return results[0][0].metadata["value"]
+        return None
+    
+    def lookup(self, text: str, key: str):
+        """Find a cached value for text close to the given one
+
+        Args:
+            text (str): Text compared by meaning, e.g. a topic or an analyst focus
+            key (str): Exact part of the input that must match, e.g. a hash of the source docs
+
+        Returns:
+            any | None: Cached value, None on a miss
+        """
+        # Nothing cached yet, skip embedding the text
+        if not self.store.store:
+            return None
+        results = self.store.similarity_search_with_score(text, k=1, filter=lambda doc: doc.metadata["key"] == key)
+        return self._best_match(results)
+    
+    async def alookup(self, text: str, key: str):
+        """Async version of lookup"""
+        if not self.store.store:
+            return None
+        results = await self.store.asimilarity_search_with_score(text, k=1, filter=lambda doc: doc.metadata["key"] == key)
+        return self._best_match(results)
+    
+    def update(self, text: str, key: str, value):
+        """Cache a value for the given text and key
+
+        Args:
+            text (str): Text compared by meaning
+            key (str): Exact part of the input that must match
+            value (any): JSON serializable result to reuse
+        """
+        self.store.add_documents([Document(page_content=text, metadata={"key": key, "value": value})])
+        self._persist()
+    
+    async def aupdate(self, text: str, key: str, value):
+        """Async version of update"""
+        await self.store.aadd_documents([Document(page_content=text, metadata={"key": key, "value": value})])
+        self._persist()